@@ -63,6 +63,21 @@ class TimeSeriesDataSet(metaclass=ABCMeta):
         """
         pass
 
+    def get_batch(self, financial_assets, start_date, end_date, **kwargs):
+        """
+        Fetch several assets at once, data sources with a batch endpoint should override this
+        :param financial_assets: list of assets
+        :param start_date:
+        :param end_date:
+        :return: dict {asset: pd.DataFrame}, assets that could not be fetched are left out
+        """
+        fetched = {}
+        for financial_asset in financial_assets:
+            result = self.get(financial_asset, start_date, end_date, **kwargs)
+            if result is not None:
+                fetched[financial_asset] = result
+        return fetched
+
 
 class CsvTimeSeriesDataSet(TimeSeriesDataSet):
     """
@@ -81,6 +96,10 @@ class CsvTimeSeriesDataSet(TimeSeriesDataSet):
         # Public
         self.name = config['name']
         self.columns = []
+        self.batch_size = 1
+        # Local files are as fast to read as the cache & may be corrected in place, don't cache them by default
+        self.ticker_cache = config['ticker_cache'] if 'ticker_cache' in config else False
+        self.throttle_errors = ()
         self.na_threshold_asset = config['na_threshold_asset'] if 'na_threshold_asset' in config else 0.05
         self.na_threshold_date = config['na_threshold_date'] if 'na_threshold_date' in config else 0.9
         self.return_check_on = config['return_check_on'] if 'return_check_on' in config else True
@@ -163,6 +182,9 @@ class QuandlTimeSeriesDataSet(TimeSeriesDataSet):
         self.name = config['name']
         self.table = config['table']
         self.columns = []
+        self.batch_size = config['batch_size'] if 'batch_size' in config else 50
+        self.ticker_cache = config['ticker_cache'] if 'ticker_cache' in config else True
+        self.throttle_errors = (quandl.LimitExceededError,)
         self.na_threshold_asset = config['na_threshold_asset'] if 'na_threshold_asset' in config else 0.05
         self.na_threshold_date = config['na_threshold_date'] if 'na_threshold_date' in config else 0.9
         self.return_check_on = config['return_check_on'] if 'return_check_on' in config else True
@@ -231,6 +253,51 @@ class QuandlTimeSeriesDataSet(TimeSeriesDataSet):
             logging.warning('quandl.get: %s is not valid - %s' % (self.to_quandl_ticker(financial_asset), e.__str__()))
             return None
 
+    def get_batch(self, financial_assets, start_date, end_date, cols=None, freq=None):
+        """
+        Fetch several assets through a single multi-dataset quandl.get call
+        :param financial_assets: list of assets
+        :param start_date:
+        :param end_date:
+        :param cols:
+        :param freq:
+        :return: dict {asset: pd.DataFrame}
+        """
+        # Filter out commented lines & map quandl codes back to our tickers
+        codes = {self.to_quandl_ticker(asset): asset for asset in financial_assets if '#' not in asset}
+        if len(codes) <= 1:
+            return super().get_batch(list(codes.values()), start_date, end_date, cols=cols, freq=freq)
+
+        # Input validation
+        if not freq:
+            freq = self.freq if self.freq else QuandlSamplingFrequency.DAY
+        freq_str = freq.value if type(freq) == QuandlSamplingFrequency else QuandlSamplingFrequency(freq).value
+
+        try:
+            merged = quandl.get(list(codes.keys()), start_date=start_date, end_date=end_date,
+                                api_key=self.__api_key, collapse=freq_str)
+        except quandl.NotFoundError as e:
+            # One invalid code fails the whole request, retry one by one so only that asset is dropped
+            logging.warning('quandl.get: batch request failed, falling back to single requests - %s' % e.__str__())
+            return super().get_batch(list(codes.values()), start_date, end_date, cols=cols, freq=freq)
+
+        # Merged columns are named '<code> - <column>', split them back into one frame per asset
+        if type(cols) == str:
+            cols = [cols]
+        split_columns = [column.split(' - ', 1) for column in merged.columns]
+        fetched = {}
+        for code, asset in codes.items():
+            positions = [i for i, (c, _) in enumerate(split_columns) if c == code]
+            if not positions:
+                continue
+            result = merged.iloc[:, positions].dropna(how='all')
+            result.columns = pd.Index([split_columns[i][1] for i in positions])
+            fetched[asset] = result[cols] if cols is not None else result
+
+        if type(self.columns) != pd.Index and fetched:
+            self.columns = pd.Index(cols) if cols is not None else next(iter(fetched.values())).columns
+        return fetched
+
 
 if __name__ == '__main__':
     import yaml
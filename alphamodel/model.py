@@ -10,10 +10,19 @@ import pickle
 import yaml
 
 from abc import ABCMeta, abstractmethod
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from .data_set import TimeSeriesDataSet
 from datetime import datetime
 from enum import Enum
-from os import path
+from functools import reduce
+from os import makedirs, path, remove, replace
+from time import sleep
+
+try:
+    # libyaml's C parser is much faster than the pure python one, use it when available
+    from yaml import CSafeLoader as _SafeLoader
+except ImportError:
+    from yaml import SafeLoader as _SafeLoader
 
 __all__ = ['Model', 'ModelState', 'SamplingFrequency']
 
@@ -54,7 +63,9 @@ class Model(metaclass=ABCMeta):
             if 'list' in cfg['universe']:
                 self._universe = cfg['universe']['list']
             elif 'path' in cfg['universe']:
-                self._universe = pd.read_csv(cfg['universe']['path'])[cfg['universe']['ticker_col']].to_list()
+                ticker_col = cfg['universe']['ticker_col']
+                self._universe = pd.read_csv(cfg['universe']['path'], usecols=[ticker_col],
+                                             engine='pyarrow')[ticker_col].to_list()
 
             # Add risk_free_symbol
             if cfg['universe']['risk_free_symbol']:
@@ -190,7 +201,7 @@ class Model(metaclass=ABCMeta):
         cfg = {}
         if isinstance(config, str):
             with open(config, 'r') as cfg_file:
-                cfg = yaml.load(cfg_file, yaml.SafeLoader)
+                cfg = yaml.load(cfg_file, _SafeLoader)
 
                 if 'alpha' not in cfg:
                     raise ValueError('\'alpha\'  section missing, required to initialize an alpha model.')
@@ -208,22 +219,45 @@ class Model(metaclass=ABCMeta):
     @property
     def filename(self):
         """
-        Generate save/load filename
+        Generate save/load filename, the manifest inside the saved model's own directory
+        :return: string
+        """
+        return path.join(self.data_dir + 'model_' + self.name + '_' + datetime.today().strftime('%Y%m%d'),
+                         'manifest.yml')
+
+    @property
+    def legacy_filename(self):
+        """
+        Generate filename of models saved as a single pickle file
         :return: string
         """
-        return self.data_dir + 'model_' + self.name + '_' + datetime.today().strftime('%Y%m%d') + '.mdl'
+        return path.dirname(self.filename) + '.mdl'
 
     def save(self):
         """
-        Save all data in class
+        Save all data in class: frames as parquet files, everything else in a yaml manifest
         :return: n/a
         """
+        base = path.dirname(self.filename)
         try:
-            f = open(self.filename, 'wb')
-            pickle.dump(self.__dict__, f, 2)
-            f.close()
+            # Frames are overwritten in place: drop the previous manifest first so an interrupted save can't be
+            #   loaded as a mix of old & new files, and only publish the new one once everything is written
+            makedirs(base, exist_ok=True)
+            if path.exists(self.filename):
+                remove(self.filename)
+            manifest = {
+                'state': self.__state.name,
+                'universe': list(self._universe),
+                'removed_assets': sorted(str(a) for a in self.__removed_assets),
+                'removed_dates': sorted(pd.Timestamp(d).isoformat() for d in self.__removed_dates),
+                'realized': self.__save_frames(self.__realized, path.join(base, 'realized')),
+                'predicted': self.__save_frames(self.__predicted, path.join(base, 'predicted')),
+            }
+            with open(self.filename + '.tmp', 'w') as f:
+                yaml.safe_dump(manifest, f)
+            replace(self.filename + '.tmp', self.filename)
         except Exception as e:
-            logging.error('save: Unable to save pickle file, {e}'.format(e=str(e)))
+            logging.error('save: Unable to save model files, {e}'.format(e=str(e)))
             return False
 
         return True
@@ -234,10 +268,36 @@ class Model(metaclass=ABCMeta):
         :return: success bool
         """
         if path.exists(self.filename):
-            # Load class from file
-            f = open(self.filename, 'rb')
-            tmp_dict = pickle.load(f)
-            f.close()
+            try:
+                with open(self.filename, 'r') as f:
+                    manifest = yaml.load(f, _SafeLoader)
+
+                state = ModelState[manifest['state']]
+                universe = manifest['universe']
+                removed_assets = set(manifest['removed_assets'])
+                removed_dates = set(pd.Timestamp(d) for d in manifest['removed_dates'])
+                realized = self.__load_frames(manifest['realized'])
+                predicted = self.__load_frames(manifest['predicted'])
+            except Exception as e:
+                logging.error('load: Unable to load model files, {e}'.format(e=str(e)))
+                return False
+
+            # Reload data from files, but keep current config & data source
+            self.__state = state
+            self._universe = universe
+            self.__removed_assets = removed_assets
+            self.__removed_dates = removed_dates
+            self.__realized = realized
+            self.__predicted = predicted
+            return True
+        elif path.exists(self.legacy_filename):
+            # Load class from legacy pickle file, through a large read buffer to cut down on read syscalls
+            try:
+                with open(self.legacy_filename, 'rb', buffering=1 << 20) as f:
+                    tmp_dict = pickle.load(f)
+            except Exception as e:
+                logging.error('load: Unable to load pickle file, {e}'.format(e=str(e)))
+                return False
 
             # Save config
             cfg = self.cfg
@@ -250,6 +310,55 @@ class Model(metaclass=ABCMeta):
 
         return False
 
+    def __save_frames(self, data, base):
+        """
+        Save (nested dicts of) frames as parquet files
+        :param data: dict
+        :param base: filename prefix
+        :return: manifest entries {key: frame file, {'__series__': series file} or {'__dict__': nested entries}}
+        """
+        entries = {}
+        for key, value in data.items():
+            key = key.value if isinstance(key, SamplingFrequency) else str(key)
+            filename = base + '.' + key.replace('/', '_')
+            if isinstance(value, dict):
+                entries[key] = {'__dict__': self.__save_frames(value, filename)}
+            elif isinstance(value, pd.Series):
+                value.to_frame('series').to_parquet(filename + '.parquet', compression='zstd')
+                entries[key] = {'__series__': path.basename(filename) + '.parquet'}
+            elif isinstance(value, pd.DataFrame):
+                value.to_parquet(filename + '.parquet', compression='zstd')
+                entries[key] = path.basename(filename) + '.parquet'
+            else:
+                logging.warning('save: Unable to save %s of type %s, it will need to be recomputed' %
+                                (key, type(value).__name__))
+        return entries
+
+    def __load_frames(self, entries, top_level=True):
+        """
+        Load (nested dicts of) frames from parquet files
+        :param entries: manifest entries as returned by __save_frames
+        :param top_level: whether keys can be sampling frequencies
+        :return: dict
+        """
+        freqs = set(freq.value for freq in SamplingFrequency)
+        data = {}
+        for key, entry in entries.items():
+            if top_level and key in freqs:
+                key = SamplingFrequency(key)
+            if isinstance(entry, str):
+                data[key] = pd.read_parquet(path.join(path.dirname(self.filename), entry))
+            elif '__series__' in entry:
+                data[key] = pd.read_parquet(path.join(path.dirname(self.filename), entry['__series__']))['series']
+            else:
+                data[key] = self.__load_frames(entry['__dict__'], top_level=False)
+
+        # All sampling frequencies are expected to be present, even if empty
+        if top_level:
+            for freq in SamplingFrequency:
+                data.setdefault(freq, {})
+        return data
+
     @abstractmethod
     def train(self, **kwargs):
         """
@@ -309,36 +418,178 @@ class Model(metaclass=ABCMeta):
         # #### Download loop
 
         # Download asset data & construct a data dictionary: {ticker: pd.DataFrame(price/volume)}
-        # If Quandl complains about the speed of requests, try adding sleep time.
-        for ticker in self._universe:
-            if ticker in raw_data:
+        # Tickers are grouped in batches of data_source.batch_size (1 == no batch endpoint) and the requests, which
+        #   are I/O bound, are issued concurrently. If Quandl complains about the speed of requests, lower
+        #   'download_workers' in the model config (1 == serial download).
+        # A throttled batch request is retried as is with an exponential backoff, up to 'download_retries' times,
+        #   splitting it would only multiply the traffic. Any other failure is retried one ticker at a time. Tickers
+        #   that still fail are reported back so the run can be failed instead of saving a model with missing assets.
+        retries = self.cfg['download_retries'] if 'download_retries' in self.cfg else 5
+
+        def download(tickers, fetch_start):
+            logging.info('downloading %s from %s to %s' % (', '.join(tickers), fetch_start, self.cfg['end_date']))
+            for attempt in range(retries + 1):
+                try:
+                    return self.data_source.get_batch(tickers, fetch_start, self.cfg['end_date'],
+                                                      freq=sampling_freq), []
+                except self.data_source.throttle_errors as e:
+                    if attempt == retries:
+                        logging.error('download: Unable to fetch %s, still throttled - %s' % (tickers, str(e)))
+                        return {}, list(tickers)
+                    logging.warning('download: throttled, retrying in %ds - %s' % (2 ** attempt, str(e)))
+                    sleep(2 ** attempt)
+                except Exception as e:
+                    if len(tickers) > 1:
+                        logging.warning('download: batch request failed, falling back to single requests - %s' %
+                                        str(e))
+                    break
+
+            fetched, failed = {}, []
+            for ticker in tickers:
+                try:
+                    result = self.data_source.get(ticker, fetch_start, self.cfg['end_date'], freq=sampling_freq)
+                except Exception as e:
+                    logging.error('download: Unable to fetch %s - %s' % (ticker, str(e)))
+                    failed.append(ticker)
+                    continue
+                if result is not None:
+                    fetched[ticker] = result
+            return fetched, failed
+
+        start_date = pd.Timestamp(self.cfg['start_date'])
+        end_date = pd.Timestamp(self.cfg['end_date'])
+        # Weekly/monthly/quarterly rows are stamped at their period end, keep the period end_date falls in
+        period_offsets = {SamplingFrequency.WEEK: pd.offsets.Week(weekday=6),
+                          SamplingFrequency.MONTH: pd.offsets.MonthEnd(),
+                          SamplingFrequency.QUARTER: pd.offsets.QuarterEnd()}
+        freq = SamplingFrequency(sampling_freq)
+        period_end = period_offsets[freq].rollforward(end_date) if freq in period_offsets else end_date
+        use_cache = self.cfg['ticker_cache'] if 'ticker_cache' in self.cfg else self.data_source.ticker_cache
+
+        # Start from the cached history where we have one & only query the dates missing from it. Hits/misses are
+        #   decided from the window requested when the cache was built, not its first/last rows (holidays, period end
+        #   dates & late listings). The last cached date is re-downloaded since its (weekly/monthly) period may not
+        #   have been complete when it was cached.
+        cached = {}
+        fetch_starts = {}
+        for ticker in dict.fromkeys(self._universe):
+            history, window = self.__load_ticker_cache(ticker, sampling_freq) if use_cache else (None, None)
+            if history is None:
+                fetch_starts.setdefault(self.cfg['start_date'], []).append(ticker)
                 continue
-            logging.info('downloading %s from %s to %s' % (ticker, self.cfg['start_date'], self.cfg['end_date']))
-            fetched = self.data_source.get(ticker, self.cfg['start_date'], self.cfg['end_date'],
-                                           freq=sampling_freq)
-            if fetched is not None:
-                raw_data[ticker] = fetched
 
-        # #### Computation
+            cached[ticker] = (history, window)
+            if start_date < window[0]:
+                fetch_starts.setdefault(self.cfg['start_date'], []).append(ticker)
+            elif end_date > window[1]:
+                in_window = history.loc[window[0]:window[1]]
+                last_date = in_window.index.max() if not in_window.empty else window[0]
+                fetch_starts.setdefault(last_date.strftime('%Y-%m-%d'), []).append(ticker)
+            else:
+                raw_data[ticker] = history.loc[start_date:period_end]
+
+        def download_all(fetch_starts):
+            batch_size = max(1, self.data_source.batch_size)
+            batches = [(tickers[i:i + batch_size], fetch_start) for fetch_start, tickers in fetch_starts.items()
+                       for i in range(0, len(tickers), batch_size)]
+
+            downloaded, failed_tickers = {}, []
+            workers = self.cfg['download_workers'] if 'download_workers' in self.cfg else 16
+            with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+                for fetched, failed in executor.map(lambda batch: download(*batch), batches):
+                    downloaded.update(fetched)
+                    failed_tickers.extend(failed)
+            return downloaded, failed_tickers
+
+        requested = [ticker for tickers in fetch_starts.values() for ticker in tickers]
+        downloaded, failed_tickers = download_all(fetch_starts)
+
+        # Adjusted columns are re-adjusted back through history after splits & dividends. If the re-downloaded rows
+        #   don't match the cached ones, the older cached rows carry a stale adjustment: refetch the whole window
+        stale = [ticker for ticker in requested if ticker in cached and ticker in downloaded and
+                 not self.__matches_cache(cached[ticker][0], downloaded[ticker])]
+        if stale:
+            logging.info('%s adjusted history changed since it was cached, refetching it' % stale)
+            for ticker in stale:
+                del cached[ticker]
+                downloaded.pop(ticker)
+            refetched, refailed = download_all({self.cfg['start_date']: stale})
+            downloaded.update(refetched)
+            failed_tickers.extend(refailed)
+
+        for ticker in requested:
+            if ticker in failed_tickers:
+                continue
+            history = downloaded.get(ticker)
+            if ticker not in cached:
+                if history is None:
+                    continue
+                window = (start_date, end_date)
+            elif history is None:
+                # Keep serving the cached history if the data source has nothing for this ticker anymore
+                raw_data[ticker] = cached[ticker][0].loc[start_date:period_end]
+                continue
+            else:
+                # Merge into the cached history, downloaded rows replace cached ones & rows outside of the requested
+                #   window are kept. Windows are only combined if they overlap.
+                cached_history, cached_window = cached[ticker]
+                history = pd.concat([cached_history, history])
+                history = history[~history.index.duplicated(keep='last')].sort_index()
+                if start_date < cached_window[0] and end_date < cached_window[0]:
+                    window = (start_date, end_date)
+                else:
+                    window = (min(start_date, cached_window[0]), max(end_date, cached_window[1]))
+
+            if use_cache:
+                self.__save_ticker_cache(ticker, sampling_freq, history, window)
+            raw_data[ticker] = history.loc[start_date:period_end]
+
+        if failed_tickers:
+            logging.error('__fetch_market_data: Unable to fetch %s, not building %s market data' %
+                          (failed_tickers, sampling_freq))
+            return False
 
-        keys = [el for el in self._universe if el not in (set(self._universe) - set(raw_data.keys()))]
+        # #### Computation
 
-        def select_first_valid_column(df, columns):
-            for column in columns:
-                if column in df.columns:
-                    return df[column]
+        # Tickers listed more than once in the universe only get one column
+        keys = list(dict.fromkeys(el for el in self._universe if el in raw_data))
+
+        # Data sources learn their columns from whichever fetch completes first, which is random with concurrent (or
+        #   no, when cached) requests. Use the first universe ticker's schema, like the serial download used to
+        if keys:
+            self.data_source.columns = raw_data[keys[0]].columns
+
+        def select_first_valid_column(columns, candidates):
+            for column in candidates:
+                if column in columns:
+                    return column
+
+        # Align every ticker on a shared index once & extract all fields into a single (field, date, ticker) array,
+        #   each field slice is then a contiguous block wrapped as a frame without further index alignment
+        # Tickers from the same provider share their schema, so the field -> column mapping is resolved once per schema
+        fields = [["Adj_Close", "Close", "Value"], ["Open"], ["Close"], ["Adj_Volume", "Volume"]]
+        index = reduce(lambda left, right: left.union(right), [raw_data[k].index for k in keys])
+        values = np.full((len(fields), len(index), len(keys)), np.nan, dtype=np.float64)
+        column_maps = {}
+        for j, k in enumerate(keys):
+            schema = tuple(raw_data[k].columns)
+            if schema not in column_maps:
+                available = set(schema)
+                selected = [(i, select_first_valid_column(available, candidates))
+                            for i, candidates in enumerate(fields)]
+                column_maps[schema] = ([i for i, column in selected if column is not None],
+                                       [column for _, column in selected if column is not None])
+            positions, columns = column_maps[schema]
+            if positions:
+                values[positions, :, j] = raw_data[k][columns].reindex(index).to_numpy(dtype=np.float64).T
 
         # extract prices
-        prices = pd.DataFrame.from_dict(
-            dict(zip(keys, [select_first_valid_column(raw_data[k], ["Adj_Close", "Close", "Value"])
-                            for k in keys])))
+        prices = pd.DataFrame(values[0], index=index, columns=keys)
 
         if 'Open' in self.data_source.columns and 'Close' in self.data_source.columns:
             # compute sigmas
-            open_prices = pd.DataFrame.from_dict(
-                dict(zip(keys, [select_first_valid_column(raw_data[k], ["Open"]) for k in keys])))
-            close_prices = pd.DataFrame.from_dict(
-                dict(zip(keys, [select_first_valid_column(raw_data[k], ["Close"]) for k in keys])))
+            open_prices = pd.DataFrame(values[1], index=index, columns=keys)
+            close_prices = pd.DataFrame(values[2], index=index, columns=keys)
 
             self.set('open_prices', open_prices, data_type='realized', sampling_freq=sampling_freq)
             self.set('close_prices', close_prices, data_type='realized', sampling_freq=sampling_freq)
@@ -349,9 +600,7 @@ class Model(metaclass=ABCMeta):
 
         if 'Volume' in self.data_source.columns or 'Adj_Volume' in self.data_source.columns:
             # extract volumes
-            volumes = pd.DataFrame.from_dict(dict(zip(keys, [select_first_valid_column(raw_data[k],
-                                                                                       ["Adj_Volume", "Volume"])
-                                                             for k in keys])))
+            volumes = pd.DataFrame(values[3], index=index, columns=keys)
 
             self.set('volumes', volumes, data_type='realized', sampling_freq=sampling_freq)
         else:
@@ -362,7 +611,10 @@ class Model(metaclass=ABCMeta):
             logging.warning('Volume columns are missing, replacing with 1bn shares/contracts')
 
         # fix risk free
-        prices[self.risk_free_symbol] = 10000 * (1 + prices[self.risk_free_symbol] / (100 * 250)).cumprod()
+        # Compound the annualized % rate into a price series on the raw array, NaNs are skipped like in pd.cumprod
+        rates = prices[self.risk_free_symbol].to_numpy(dtype=np.float64)
+        growth = np.cumprod(np.where(np.isnan(rates), 1., 1 + rates / (100 * 250)))
+        prices[self.risk_free_symbol] = np.where(np.isnan(rates), np.nan, 10000 * growth)
 
         # #### Save raw price data
         self.set('raw_data', raw_data, data_type='realized', sampling_freq=sampling_freq)
@@ -370,6 +622,87 @@ class Model(metaclass=ABCMeta):
 
         return True
 
+    def __ticker_cache_file(self, ticker, sampling_freq):
+        """
+        Generate per ticker history cache filename
+        :param ticker:
+        :param sampling_freq:
+        :return: string
+        """
+        return path.join(self.data_dir, 'ticker_cache', '%s_%s_%s.parquet' %
+                         (self.data_source.name, ticker.replace('/', '_'), sampling_freq))
+
+    @staticmethod
+    def __matches_cache(cached, downloaded):
+        """
+        Check that re-downloaded rows overlapping the cached history agree on its adjusted columns
+        :param cached: pd.DataFrame
+        :param downloaded: pd.DataFrame
+        :return: bool
+        """
+        columns = [c for c in downloaded.columns if str(c).startswith('Adj') and c in cached.columns]
+        dates = downloaded.index.intersection(cached.index)
+        if not columns or not len(dates):
+            return True
+
+        return np.allclose(cached.loc[dates, columns].to_numpy(dtype=np.float64),
+                           downloaded.loc[dates, columns].to_numpy(dtype=np.float64), rtol=1e-6, equal_nan=True)
+
+    def __load_ticker_cache(self, ticker, sampling_freq):
+        """
+        Load cached ticker history & the (start, end) window that was requested to build it
+        :param ticker:
+        :param sampling_freq:
+        :return: (pd.DataFrame, (pd.Timestamp, pd.Timestamp)) or (None, None) if not cached
+        """
+        filename = self.__ticker_cache_file(ticker, sampling_freq)
+        window_file = path.splitext(filename)[0] + '.yml'
+        if not path.exists(filename) or not path.exists(window_file):
+            return None, None
+
+        try:
+            with open(window_file, 'r') as f:
+                window = yaml.load(f, _SafeLoader)
+            return pd.read_parquet(filename), (pd.Timestamp(window['start']), pd.Timestamp(window['end']))
+        except Exception as e:
+            logging.warning('load: Unable to read ticker cache %s, %s' % (filename, str(e)))
+            return None, None
+
+    def __save_ticker_cache(self, ticker, sampling_freq, history, window):
+        """
+        Save ticker history to cache, along with the (start, end) window it covers
+        :param ticker:
+        :param sampling_freq:
+        :param history: pd.DataFrame
+        :param window: (pd.Timestamp, pd.Timestamp)
+        :return: success bool
+        """
+        try:
+            filename = self.__ticker_cache_file(ticker, sampling_freq)
+            makedirs(path.dirname(filename), exist_ok=True)
+            history.to_parquet(filename, compression='zstd')
+            with open(path.splitext(filename)[0] + '.yml', 'w') as f:
+                yaml.safe_dump({'start': window[0].isoformat(), 'end': window[1].isoformat()}, f)
+        except Exception as e:
+            logging.warning('save: Unable to save ticker cache for %s, %s' % (ticker, str(e)))
+            return False
+
+        return True
+
+    @staticmethod
+    def __simple_returns(prices):
+        """
+        Simple returns p[t] / p[t-1] - 1 computed on the underlying array, remaining NaNs are forward filled
+        :param prices: pd.DataFrame
+        :return: pd.DataFrame, without the first date
+        """
+        values = prices.to_numpy(dtype=np.float64)
+        returns = np.empty((max(values.shape[0] - 1, 0), values.shape[1]), dtype=np.float64)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            np.divide(values[1:], values[:-1], out=returns)
+        returns -= 1.0
+        return pd.DataFrame(returns, index=prices.index[1:], columns=prices.columns).ffill()
+
     def __validate_and_sync_return_data(self):
         """
         Validate and sync up return data
@@ -379,6 +712,10 @@ class Model(metaclass=ABCMeta):
                       ('allow_value_only' in self.cfg and self.cfg['allow_value_only'])
         volume_avail = ('Volume' in self.data_source.columns or 'Adj_Volume' in self.data_source.columns) or \
                        ('allow_value_only' in self.cfg and self.cfg['allow_value_only'])
+        # Storage precision of the realized frames, float32 halves memory use, set to float64 for sensitive strategies
+        dtype = np.dtype(self.cfg['dtype'] if 'dtype' in self.cfg else 'float32')
+        # Per date/asset NaN count tables are only built & logged in verbose mode
+        verbose = self.cfg['verbose'] if 'verbose' in self.cfg else False
 
         # For each sampling frequency, validate the data & store problem assets/dates
         for freq in self._realized:
@@ -392,37 +729,32 @@ class Model(metaclass=ABCMeta):
 
             # Validate prices
             # Filter NaNs - threshold fetched from self.__data_source
-            bad_assets = prices.columns[prices.isnull().sum() > len(prices) * self.__data_source.na_threshold_asset]
+            price_nulls = prices.isnull()
+            bad_assets = prices.columns[price_nulls.sum() > len(prices) * self.__data_source.na_threshold_asset]
             if len(bad_assets):
                 self.__removed_assets = self.__removed_assets.union(set(bad_assets))
 
             # Fix dates on which many assets have missing values
+            # All frames of a sampling frequency share the same index, so the bad dates are OR-ed as boolean masks
             nassets = prices.shape[1]
-            bad_dates_p = prices.index[prices.isnull().sum(1) >=
-                                       min(nassets * self.__data_source.na_threshold_date, nassets - 1)]
-            if range_avail:
-                bad_dates_o = open_prices.index[open_prices.isnull().sum(1) >=
-                                                min(nassets * self.__data_source.na_threshold_date, nassets - 1)]
-                bad_dates_c = close_prices.index[close_prices.isnull().sum(1) >=
-                                                 min(nassets * self.__data_source.na_threshold_date, nassets - 1)]
-            if volume_avail:
-                bad_dates_v = volumes.index[volumes.isnull().sum(1) >=
-                                            min(nassets * self.__data_source.na_threshold_date, nassets - 1)]
-
-            bad_dates = set(bad_dates_p)
+            threshold = min(nassets * self.__data_source.na_threshold_date, nassets - 1)
+            bad_mask = price_nulls.sum(1).to_numpy() >= threshold
             if range_avail:
-                bad_dates = bad_dates.union(set(bad_dates_o)).union(set(bad_dates_c))
+                bad_mask |= open_prices.isnull().sum(1).to_numpy() >= threshold
+                bad_mask |= close_prices.isnull().sum(1).to_numpy() >= threshold
             if volume_avail:
-                bad_dates = bad_dates.union(set(bad_dates_v))
+                bad_mask |= volumes.isnull().sum(1).to_numpy() >= threshold
+            bad_dates = prices.index[bad_mask]
 
             # Maintain list of removed dates across all data fetches
             if len(bad_dates):
                 self.__removed_dates = self.__removed_dates.union(set(bad_dates))
 
             # Compute returns
-            returns = (prices.diff() / prices.shift(1)).fillna(method='ffill').iloc[1:]
-            bad_assets = returns.columns[((self.__data_source.return_min > returns).sum() > 0) |
-                                         ((returns > self.__data_source.return_max).sum() > 0)]
+            returns = self.__simple_returns(prices)
+            values = returns.to_numpy()
+            bad_assets = returns.columns[np.any((values < self.__data_source.return_min) |
+                                                (values > self.__data_source.return_max), axis=0)]
 
             # Maintain list of removed assets across all data fetches
             if self.__data_source.return_check_on and len(bad_assets):
@@ -445,34 +777,48 @@ class Model(metaclass=ABCMeta):
             if len(self.__removed_assets):
                 logging.warning('%s assets %s have too many NaNs, removing them' % (str(freq), self.__removed_assets))
 
-                prices = prices.loc[:, ~prices.columns.isin(self.__removed_assets)]
+                # All frames share the same column order, take the same column positions from each
+                keep_assets = np.flatnonzero(~prices.columns.isin(self.__removed_assets))
+                prices = prices.iloc[:, keep_assets]
                 if range_avail:
-                    open_prices = open_prices.loc[:, ~open_prices.columns.isin(self.__removed_assets)]
-                    close_prices = close_prices.loc[:, ~close_prices.columns.isin(self.__removed_assets)]
+                    open_prices = open_prices.iloc[:, keep_assets]
+                    close_prices = close_prices.iloc[:, keep_assets]
                 if volume_avail:
-                    volumes = volumes.loc[:, ~volumes.columns.isin(self.__removed_assets)]
+                    volumes = volumes.iloc[:, keep_assets]
+
+            # NaN locations are scanned once & filtered along with prices, until forward fills invalidate them
+            price_nulls = prices.isnull()
 
             # Fix dates on which many assets have missing values
             if len(self.__removed_dates):
                 bad_dates_idx = pd.Index(self.__removed_dates).sort_values()
-                logging.warning("Removing these days from dataset:")
-                logging.warning(pd.DataFrame({'nan price': prices.isnull().sum(1)}))
+                if verbose:
+                    logging.warning("Removing these days from dataset:")
+                    logging.warning(pd.DataFrame({'nan price': price_nulls.sum(1)}))
 
-                prices = prices.loc[~prices.index.isin(bad_dates_idx)]
+                keep_dates = np.flatnonzero(~prices.index.isin(bad_dates_idx))
+                prices = prices.iloc[keep_dates]
+                price_nulls = price_nulls.iloc[keep_dates]
                 if range_avail:
-                    open_prices = open_prices.loc[~open_prices.index.isin(bad_dates_idx)]
-                    close_prices = close_prices.loc[~close_prices.index.isin(bad_dates_idx)]
+                    open_prices = open_prices.iloc[keep_dates]
+                    close_prices = close_prices.iloc[keep_dates]
                 if volume_avail:
-                    volumes = volumes.loc[~volumes.index.isin(bad_dates_idx)]
+                    volumes = volumes.iloc[keep_dates]
 
             # Fix prices
-            if sum([x.isnull().sum().sum() for x in [prices]]) != 0:
-                logging.warning(pd.DataFrame({'remaining nan price': prices.isnull().sum()}))
+            remaining_nans = price_nulls.sum()
+            if remaining_nans.sum() != 0:
+                if verbose:
+                    logging.warning(pd.DataFrame({'remaining nan price': remaining_nans}))
                 logging.warning('Proceeding with forward fills to remove remaining NaNs')
 
             if range_avail:
                 # ### Calculate sigmas
-                sigmas = np.abs(np.log(open_prices.astype(float)) - np.log(close_prices.astype(float)))
+                # |log(open) - log(close)| == |log(open / close)|, computed in place in a single buffer
+                sigmas = np.divide(open_prices.to_numpy(dtype=np.float64), close_prices.to_numpy(dtype=np.float64))
+                np.log(sigmas, out=sigmas)
+                np.abs(sigmas, out=sigmas)
+                sigmas = pd.DataFrame(sigmas, index=open_prices.index, columns=open_prices.columns)
 
             if volume_avail:
                 # #### Calculate volumes
@@ -480,13 +826,13 @@ class Model(metaclass=ABCMeta):
                 volumes = volumes * prices
 
             # Forward fill any gaps
-            prices = prices.fillna(method='ffill')
+            prices = prices.ffill()
             if range_avail:
-                open_prices = open_prices.fillna(method='ffill')
-                close_prices = close_prices.fillna(method='ffill')
-                sigmas = sigmas.fillna(method='ffill')
+                open_prices = open_prices.ffill()
+                close_prices = close_prices.ffill()
+                sigmas = sigmas.ffill()
             if volume_avail:
-                volumes = volumes.fillna(method='ffill')
+                volumes = volumes.ffill()
 
             # Also remove the first row just in case it had gaps since we can't forward fill it
             prices = prices.iloc[1:]
@@ -498,11 +844,13 @@ class Model(metaclass=ABCMeta):
                 volumes = volumes.iloc[1:]
 
             # At this point there should be no NaNs remaining
-            if sum([x.isnull().sum().sum() for x in [prices]]) != 0:
-                logging.warning(pd.DataFrame({'remaining nan price': prices.isnull().sum()}))
+            if verbose:
+                remaining_nans = prices.isnull().sum()
+                if remaining_nans.sum() != 0:
+                    logging.warning(pd.DataFrame({'remaining nan price': remaining_nans}))
 
             # #### Compute returns & fill NaNs
-            returns = (prices.diff() / prices.shift(1)).fillna(method='ffill').iloc[1:]
+            returns = self.__simple_returns(prices)
             returns = returns.replace([np.inf, -np.inf], np.nan).fillna(0)
 
             # Remove USDOLLAR except from returns
@@ -514,6 +862,17 @@ class Model(metaclass=ABCMeta):
             if volume_avail:
                 volumes = volumes.iloc[:, :-1]
 
+            # Downcast once all calculations are done, computations above (e.g. risk free compounding) stay in float64
+            if dtype != np.float64:
+                prices = prices.astype(dtype, copy=False)
+                returns = returns.astype(dtype, copy=False)
+                if range_avail:
+                    open_prices = open_prices.astype(dtype, copy=False)
+                    close_prices = close_prices.astype(dtype, copy=False)
+                    sigmas = sigmas.astype(dtype, copy=False)
+                if volume_avail:
+                    volumes = volumes.astype(dtype, copy=False)
+
             # Save all calculated data
             self.set('prices', prices, data_type='realized', sampling_freq=freq)
             self.set('returns', returns, data_type='realized', sampling_freq=freq)
@@ -534,9 +893,19 @@ class Model(metaclass=ABCMeta):
         if 'factors' in self.cfg['covariance']:
             data_set = self.cfg['covariance']['factors']
 
-        ds = pdr.DataReader(data_set, 'famafrench', start=self.cfg['start_date'], end=self.cfg['end_date'])
-        ff_returns = ds[0]
-        ff_returns.index = ff_returns.index.to_timestamp()
+        # Factor data only changes with the request parameters, keep a parquet copy to skip the download next time
+        cache_file = path.join(self.data_dir, '%s_%s_%s.parquet' % (data_set, self.cfg['start_date'],
+                                                                    self.cfg['end_date']))
+        if path.exists(cache_file):
+            ff_returns = pd.read_parquet(cache_file)
+        else:
+            ds = pdr.DataReader(data_set, 'famafrench', start=self.cfg['start_date'], end=self.cfg['end_date'])
+            ff_returns = ds[0]
+            ff_returns.index = ff_returns.index.to_timestamp()
+            try:
+                ff_returns.to_parquet(cache_file, compression='zstd')
+            except Exception as e:
+                logging.warning('save: Unable to cache %s factor data, %s' % (data_set, str(e)))
         self.set('ff_returns', ff_returns, data_type='realized', sampling_freq='daily')
 
         return True
@@ -111,7 +111,7 @@ class SingleStockEWM(Model):
                 idyos[day] = pd.Series(np.diag(used_returns.cov().values -
                                                exposures[day].values @ factor_sigma[day].values @ exposures[
                                                    day].values.T),
-                                       index=realized_returns.columns).fillna(method='ffill')
+                                       index=realized_returns.columns).ffill()
                 idyos[day][idyos[day] < 0] = 0
 
             self.set('factor_sigma', pd.concat(factor_sigma.values(), axis=0, keys=factor_sigma.keys()), 'predicted')
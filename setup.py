@@ -12,8 +12,9 @@ setup(
     license='Apache',
     zip_safe=False,
     description='Financial Alpha Modeling Package',
-    install_requires=["pandas",
+    install_requires=["pandas>=1.4",
                       "numpy",
+                      "pyarrow",
                       "matplotlib",
                       "seaborn",
                       "cvxpy>=1.0.6",
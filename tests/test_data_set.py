@@ -0,0 +1,52 @@
+"""
+Data source tests, Quandl requests are replaced by canned responses
+"""
+import numpy as np
+import pandas as pd
+import pytest
+import quandl
+
+from alphamodel.data_set import QuandlTimeSeriesDataSet
+
+
+@pytest.fixture
+def data_source():
+    return QuandlTimeSeriesDataSet({'name': 'eod', 'table': 'EOD', 'api_key': 'key'})
+
+
+def test_get_batch_splits_merged_columns(data_source, monkeypatch):
+    dates = pd.date_range('2017-01-02', periods=3)
+    merged = pd.DataFrame({'EOD/AAA - Open': [1., 2., 3.], 'EOD/AAA - Adj_Close': [1.5, 2.5, 3.5],
+                           'EOD/BRK_B - Open': [np.nan, 20., 30.], 'EOD/BRK_B - Adj_Close': [np.nan, 25., 35.]},
+                          index=dates)
+    requested = []
+
+    def get(codes, **kwargs):
+        requested.append(codes)
+        return merged
+
+    monkeypatch.setattr(quandl, 'get', get)
+    fetched = data_source.get_batch(['AAA', 'BRK.B', '#CCC'], '20170101', '20170131')
+
+    assert requested == [['EOD/AAA', 'EOD/BRK_B']]
+    assert set(fetched) == {'AAA', 'BRK.B'}
+    assert list(fetched['AAA'].columns) == ['Open', 'Adj_Close']
+    assert fetched['AAA']['Adj_Close'].tolist() == [1.5, 2.5, 3.5]
+    # Rows that only exist for other tickers of the batch are dropped
+    assert fetched['BRK.B'].index.tolist() == dates[1:].tolist()
+    assert list(data_source.columns) == ['Open', 'Adj_Close']
+
+
+def test_get_batch_falls_back_to_single_requests_on_invalid_code(data_source, monkeypatch):
+    single = pd.DataFrame({'Adj_Close': [1., 2.]}, index=pd.date_range('2017-01-02', periods=2))
+
+    def get(codes, **kwargs):
+        if isinstance(codes, list) or codes == 'EOD/BAD':
+            raise quandl.NotFoundError('not found')
+        return single
+
+    monkeypatch.setattr(quandl, 'get', get)
+    fetched = data_source.get_batch(['AAA', 'BAD'], '20170101', '20170131')
+
+    assert list(fetched) == ['AAA']
+    pd.testing.assert_frame_equal(fetched['AAA'], single)
@@ -0,0 +1,136 @@
+"""
+Model data fetching, ticker cache & save/load tests on a local csv data source
+"""
+import numpy as np
+import pandas as pd
+import pytest
+import yaml
+
+from alphamodel.model import Model
+
+
+class CsvModel(Model):
+    """
+    Minimal concrete model, only the base data handling is exercised
+    """
+    def train(self, **kwargs):
+        pass
+
+    def predict(self, **kwargs):
+        pass
+
+    def prediction_quality(self, statistic=None):
+        pass
+
+    def predict_next(self, **kwargs):
+        pass
+
+    def show_results(self, **kwargs):
+        pass
+
+
+def write_csv(csv_dir, ticker, prices, dates):
+    pd.DataFrame({'Date': dates.strftime('%Y-%m-%d'), 'Open': prices * 1.001, 'Close': prices,
+                  'Adj_Close': prices, 'Adj_Volume': 1e6}).to_csv(csv_dir / (ticker + '.csv'), index=False)
+
+
+@pytest.fixture
+def csv_config(tmp_path):
+    csv_dir = tmp_path / 'csv'
+    csv_dir.mkdir()
+    dates = pd.bdate_range('2017-01-02', '2017-12-29')
+    rng = np.random.default_rng(0)
+    for ticker in ['AAA', 'BBB']:
+        write_csv(csv_dir, ticker, 100 * np.exp(np.cumsum(rng.normal(0, .01, len(dates)))), dates)
+    pd.DataFrame({'Date': dates.strftime('%Y-%m-%d'), 'Value': 1.}).to_csv(csv_dir / 'DTB3.csv', index=False)
+
+    return {
+        'name': 'test',
+        'universe': {'list': ['AAA', 'BBB', 'AAA'], 'risk_free_symbol': 'USDOLLAR'},
+        'data': {'name': 'csv', 'source': 'csv', 'path': str(csv_dir), 'dt_column': 'Date', 'dt_format': '%Y-%m-%d',
+                 'na_threshold_asset': 0.5},
+        'model': {'start_date': '20170101', 'end_date': '20171130', 'data_dir': str(tmp_path) + '/',
+                  'ticker_cache': True, 'download_workers': 1, 'returns': {'sampling_freq': 'daily'},
+                  'covariance': {'method': 'SS'}},
+    }
+
+
+def fetch(config, end_date=None, sampling_freq=None):
+    """
+    Run a forced fetch & record the (ticker, start) of every download request
+    """
+    if end_date:
+        config['model']['end_date'] = end_date
+    if sampling_freq:
+        config['model']['returns']['sampling_freq'] = sampling_freq
+    model = CsvModel(config)
+    requests = []
+    get = model.data_source.get
+
+    def recording_get(ticker, start_date, end_date, **kwargs):
+        requests.append((ticker, start_date))
+        return get(ticker, start_date, end_date, **kwargs)
+
+    model.data_source.get = recording_get
+    assert model._fetch_base_data(force=True)
+    return model, requests
+
+
+def test_duplicate_universe_tickers_get_one_column(csv_config):
+    model, _ = fetch(csv_config)
+    assert list(model.get('prices').columns) == ['AAA', 'BBB']
+
+
+def test_ticker_cache_only_fetches_missing_dates(csv_config, tmp_path):
+    fetch(csv_config)
+    model, requests = fetch(csv_config, end_date='20171229')
+
+    assert sorted(requests) == [('AAA', '2017-11-30'), ('BBB', '2017-11-30'), ('USDOLLAR', '2017-11-30')]
+    assert model.get('prices').index[-1] == pd.Timestamp('2017-12-29')
+    with open(tmp_path / 'ticker_cache' / 'csv_AAA_daily.yml') as f:
+        window = yaml.safe_load(f)
+    assert (pd.Timestamp(window['start']), pd.Timestamp(window['end'])) == \
+        (pd.Timestamp('2017-01-01'), pd.Timestamp('2017-12-29'))
+
+
+def test_ticker_cache_hit_when_first_row_is_after_start(csv_config):
+    # Monthly rows are stamped at month end & 2017-01-01 is a holiday, the cached window still covers the request
+    fetch(csv_config, sampling_freq='monthly')
+    _, requests = fetch(csv_config, sampling_freq='monthly')
+    assert requests == []
+
+
+def test_ticker_cache_refetches_window_when_adjustment_changes(csv_config, tmp_path):
+    fetch(csv_config)
+
+    # 2:1 split, the whole adjusted history is restated
+    csv_file = tmp_path / 'csv' / 'AAA.csv'
+    data = pd.read_csv(csv_file)
+    data['Adj_Close'] *= 0.5
+    data.to_csv(csv_file, index=False)
+
+    model, requests = fetch(csv_config, end_date='20171229')
+    assert ('AAA', '20170101') in requests
+    assert model.get('returns')['AAA'].min() > -0.1
+
+
+def test_period_end_row_kept_when_end_date_is_mid_period(csv_config):
+    model, _ = fetch(csv_config, end_date='20171215', sampling_freq='monthly')
+    assert model.get('prices', sampling_freq='monthly').index[-1] == pd.Timestamp('2017-12-31')
+
+
+def test_save_load_round_trip(csv_config):
+    model, _ = fetch(csv_config)
+
+    loaded = CsvModel(csv_config)
+    assert loaded.load()
+    for item in ['prices', 'returns', 'sigmas', 'volumes']:
+        pd.testing.assert_frame_equal(loaded.get(item), model.get(item), check_freq=False)
+    assert set(loaded.get('raw_data')) == {'AAA', 'BBB', 'USDOLLAR'}
+    assert loaded._Model__removed_dates == model._Model__removed_dates
+
+
+def test_load_returns_false_on_missing_frame(csv_config, tmp_path):
+    model, _ = fetch(csv_config)
+    (tmp_path / ('model_test_' + pd.Timestamp.today().strftime('%Y%m%d')) / 'realized.daily.prices.parquet').unlink()
+    assert not CsvModel(csv_config).load()